@@ -5,13 +5,16 @@
 
 import os  # https://docs.python.org/3/library/os.html
 import sys  # https://docs.python.org/3/library/sys.html
-import json  # https://docs.python.org/3/library/json.html
 import time  # https://docs.python.org/3/library/time.html
-import random  # https://docs.python.org/3/library/random.html
+import socket  # https://docs.python.org/3/library/socket.html
 import argparse  # https://docs.python.org/3/library/argparse.html
+import asyncio  # https://docs.python.org/3/library/asyncio.html
 import logging  # https://docs.python.org/3/library/logging.html
 import sqlite3  # https://docs.python.org/3/library/sqlite3.html
-from datetime import datetime  # https://docs.python.org/3/library/datetime.html
+import queue  # https://docs.python.org/3/library/queue.html
+import threading  # https://docs.python.org/3/library/threading.html
+from collections import deque  # https://docs.python.org/3/library/collections.html#collections.deque
+from contextlib import contextmanager  # https://docs.python.org/3/library/contextlib.html#contextlib.contextmanager
 
 # Third-party libraries with official docs linked
 
@@ -19,14 +22,27 @@ from datetime import datetime  # https://docs.python.org/3/library/datetime.html
 # Docs: https://www.eclipse.org/paho/index.php?page=clients/python/docs/index.php
 import paho.mqtt.client as mqtt  # https://www.eclipse.org/paho/index.php?page=clients/python/docs/index.php
 
-# opcua library for building an OPC UA server
-# Docs: https://freeopcua.github.io/python-opcua/
-from opcua import ua, Server  # https://freeopcua.github.io/python-opcua/
+# asyncua library for building an OPC UA server
+# Docs: https://opcua-asyncio.readthedocs.io/en/latest/
+from asyncua import ua, Server  # https://opcua-asyncio.readthedocs.io/en/latest/
+
+# msgspec for schema-validated decoding straight into typed structs
+# Docs: https://jcristharif.com/msgspec/
+import msgspec  # https://jcristharif.com/msgspec/
+
+# NumPy for batched sampling and pandas for columnar chart data
+# Docs: https://numpy.org/doc/stable/ and https://pandas.pydata.org/docs/
+import numpy as np  # https://numpy.org/doc/stable/
+import pandas as pd  # https://pandas.pydata.org/docs/
 
 # Streamlit for a lightweight dashboard
 # Docs: https://docs.streamlit.io/
 import streamlit as st  # https://docs.streamlit.io/
 
+# Typed hot paths (publish tick with orjson encoding, message handling, batch drain); resolves to
+# the mypyc-built extension when one has been compiled
+from iiot_system_hot import drain, handle_message, publish_tick  # see iiot_system_hot.py
+
 # ---------- Configuration Helpers ----------
 
 def env(key: str, default: str) -> str:
@@ -46,52 +62,236 @@ def mk_logger(name: str = __name__) -> logging.Logger:
 
 log = mk_logger("iiot")  # https://docs.python.org/3/library/logging.html
 
+# Per-message records go to a child logger that is quiet by default; it propagates to the "iiot" handler
+msg_log = logging.getLogger("iiot.msg")  # https://docs.python.org/3/library/logging.html#logging.getLogger
+msg_log.setLevel(env("IIOT_MSG_LOG_LEVEL", "WARNING").upper())  # https://docs.python.org/3/library/logging.html#logging.Logger.setLevel
+LOG_EVERY = int(env("IIOT_LOG_EVERY", "1000"))  # https://docs.python.org/3/library/functions.html#int
+
+def rate_logger(label: str, every: int = LOG_EVERY):
+    """Return a tick(n) callable that logs a throughput summary every N messages."""  # https://docs.python.org/3/library/logging.html#logging.Logger.info
+    count = 0
+    t0 = time.monotonic()  # https://docs.python.org/3/library/time.html#time.monotonic
+
+    def tick(n: int = 1) -> None:
+        nonlocal count, t0  # https://docs.python.org/3/reference/simple_stmts.html#the-nonlocal-statement
+        count += n
+        if count >= every:  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+            now = time.monotonic()  # https://docs.python.org/3/library/time.html#time.monotonic
+            log.info("%s %d messages (%.1f msg/s)", label, count, count / max(now - t0, 1e-9))  # https://docs.python.org/3/howto/logging.html#optimization
+            count = 0
+            t0 = now
+
+    return tick  # https://docs.python.org/3/library/functions.html#return
+
 # ---------- SQLite Utilities ----------
 
 DB_PATH = env("IIOT_DB", "telemetry.db")  # https://docs.python.org/3/library/os.html#os.getenv
 
-def db_init(db_path: str = DB_PATH) -> None:
-    """Initialize SQLite schema for telemetry."""  # https://docs.python.org/3/library/sqlite3.html
-    conn = sqlite3.connect(db_path)  # https://docs.python.org/3/library/sqlite3.html#sqlite3.connect
-    try:  # https://docs.python.org/3/tutorial/errors.html#handling-exceptions
-        cur = conn.cursor()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.cursor
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS telemetry (
-              id INTEGER PRIMARY KEY AUTOINCREMENT,
-              ts TEXT NOT NULL,
-              sensor TEXT NOT NULL,
-              temperature REAL NOT NULL,
-              humidity REAL NOT NULL
-            )
-            """
-        )  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Cursor.execute
-        conn.commit()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.commit
+# Per-connection tuning; journal_mode=WAL is persistent and only set in db_init
+SQLITE_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",  # https://www.sqlite.org/pragma.html#pragma_synchronous
+    "PRAGMA temp_store=MEMORY",  # https://www.sqlite.org/pragma.html#pragma_temp_store
+    "PRAGMA cache_size=-20000",  # https://www.sqlite.org/pragma.html#pragma_cache_size
+    "PRAGMA busy_timeout=5000",  # https://www.sqlite.org/pragma.html#pragma_busy_timeout
+    "PRAGMA foreign_keys=ON",  # https://www.sqlite.org/pragma.html#pragma_foreign_keys
+)  # https://docs.python.org/3/library/stdtypes.html#tuple
+
+def db_tune(conn: sqlite3.Connection) -> None:
+    """Apply per-connection PRAGMAs."""  # https://www.sqlite.org/pragma.html
+    cur = conn.cursor()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.cursor
+    for pragma in SQLITE_PRAGMAS:  # https://docs.python.org/3/reference/compound_stmts.html#the-for-statement
+        cur.execute(pragma)  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Cursor.execute
+
+DB_READERS = int(env("IIOT_DB_READERS", str(os.cpu_count() or 4)))  # https://docs.python.org/3/library/os.html#os.cpu_count
+
+# One long-lived writer and a pool of readers per database path (WAL allows concurrent reads)
+_pool_lock = threading.Lock()  # https://docs.python.org/3/library/threading.html#lock-objects
+_writer_lock = threading.Lock()  # https://docs.python.org/3/library/threading.html#lock-objects
+_writer_conns = {}  # https://docs.python.org/3/library/stdtypes.html#dict
+_reader_pools = {}  # https://docs.python.org/3/library/stdtypes.html#dict
+
+def db_connect(db_path: str = DB_PATH, isolation_level=None) -> sqlite3.Connection:
+    """Open a tuned connection that may be shared across threads."""  # https://docs.python.org/3/library/sqlite3.html#sqlite3.connect
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=isolation_level)  # https://docs.python.org/3/library/sqlite3.html#sqlite3.connect
+    db_tune(conn)  # see above
+    return conn  # https://docs.python.org/3/library/functions.html#return
+
+def db_writer(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """Return the shared writer connection; callers must hold _writer_lock."""  # https://www.sqlite.org/lang_transaction.html
+    with _pool_lock:  # https://docs.python.org/3/library/threading.html#using-locks-conditions-and-semaphores-in-the-with-statement
+        conn = _writer_conns.get(db_path)  # https://docs.python.org/3/library/stdtypes.html#dict.get
+        if conn is None:  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+            # Implicit transactions open with BEGIN IMMEDIATE so the write lock is taken upfront
+            conn = db_connect(db_path, isolation_level="IMMEDIATE")  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.isolation_level
+            _writer_conns[db_path] = conn  # https://docs.python.org/3/library/stdtypes.html#dict
+    return conn  # https://docs.python.org/3/library/functions.html#return
+
+def db_reader_pool(size: int = DB_READERS) -> queue.LifoQueue:
+    """Create a pool of `size` reader slots; connections are opened on first checkout."""  # https://docs.python.org/3/library/queue.html#queue.LifoQueue
+    pool = queue.LifoQueue(maxsize=size)  # LIFO hands back an open connection before an empty slot
+    for _ in range(size):  # https://docs.python.org/3/library/stdtypes.html#range
+        pool.put(None)  # https://docs.python.org/3/library/queue.html#queue.Queue.put
+    return pool  # https://docs.python.org/3/library/functions.html#return
+
+@contextmanager
+def db_reader(db_path: str = DB_PATH, pool=None):
+    """Check out a reader connection from `pool`, or the module pool for db_path."""  # https://docs.python.org/3/library/queue.html
+    if pool is None:  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+        with _pool_lock:  # https://docs.python.org/3/library/threading.html#using-locks-conditions-and-semaphores-in-the-with-statement
+            pool = _reader_pools.get(db_path)  # https://docs.python.org/3/library/stdtypes.html#dict.get
+            if pool is None:  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+                pool = _reader_pools[db_path] = db_reader_pool()  # see above
+    conn = pool.get()  # https://docs.python.org/3/library/queue.html#queue.Queue.get
+    try:
+        if conn is None:  # empty slot: open lazily
+            conn = db_connect(db_path)  # see above
+        yield conn  # https://docs.python.org/3/reference/simple_stmts.html#the-yield-statement
     finally:
-        conn.close()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.close
-
-def db_insert(ts: str, sensor: str, temperature: float, humidity: float, db_path: str = DB_PATH) -> None:
-    """Insert a telemetry row."""  # https://docs.python.org/3/library/sqlite3.html
-    conn = sqlite3.connect(db_path)  # https://docs.python.org/3/library/sqlite3.html#sqlite3.connect
+        pool.put(conn)  # https://docs.python.org/3/library/queue.html#queue.Queue.put
+
+_SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS telemetry (
+      id INTEGER PRIMARY KEY AUTOINCREMENT,
+      ts INTEGER NOT NULL,
+      sensor TEXT NOT NULL,
+      temperature REAL NOT NULL,
+      humidity REAL NOT NULL
+    )
+"""  # https://www.sqlite.org/lang_createtable.html
+
+# Legacy ts values are ISO-8601 strings (or digit strings written after an unmigrated upgrade);
+# convert both to epoch nanoseconds. Unparseable values become NULL and abort the migration.
+_MIGRATE_TS_SQL = """
+    INSERT INTO telemetry(id, ts, sensor, temperature, humidity)
+    SELECT id,
+           CASE
+             WHEN ts <> '' AND ts NOT GLOB '*[^0-9]*' THEN CAST(ts AS INTEGER)
+             ELSE CAST(strftime('%s', ts) AS INTEGER) * 1000000000
+                  + CAST(substr(strftime('%f', ts), 4) AS INTEGER) * 1000000
+           END,
+           sensor, temperature, humidity
+    FROM telemetry_legacy
+"""  # https://www.sqlite.org/lang_datefunc.html
+
+def _ts_column_type(cur: sqlite3.Cursor) -> str:
+    """Return the declared type of telemetry.ts, upper-cased."""  # https://www.sqlite.org/pragma.html#pragma_table_info
+    columns = {row[1]: row[2].upper() for row in cur.execute("PRAGMA table_info(telemetry)")}  # https://www.sqlite.org/pragma.html#pragma_table_info
+    return columns.get("ts", "")  # https://docs.python.org/3/library/stdtypes.html#dict.get
+
+def _migrate_ts_to_integer(conn: sqlite3.Connection, db_path: str) -> None:
+    """Rebuild a pre-INTEGER telemetry table with epoch-nanosecond timestamps."""  # https://www.sqlite.org/lang_altertable.html#otheralter
+    cur = conn.cursor()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.cursor
     try:
-        cur = conn.cursor()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.cursor
-        cur.execute(
-            "INSERT INTO telemetry(ts, sensor, temperature, humidity) VALUES (?, ?, ?, ?)",
-            (ts, sensor, temperature, humidity),
-        )  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Cursor.execute
+        cur.execute("BEGIN IMMEDIATE")  # one transaction so a failure leaves the old table intact
+        # Another process may have migrated between our check and taking the write lock
+        if _ts_column_type(cur) == "INTEGER":  # see above
+            conn.rollback()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.rollback
+            return  # https://docs.python.org/3/reference/simple_stmts.html#the-return-statement
+        log.warning(f"Migrating telemetry.ts from TEXT to INTEGER in {db_path}")  # https://docs.python.org/3/library/logging.html#logging.Logger.warning
+        cur.execute("ALTER TABLE telemetry RENAME TO telemetry_legacy")  # https://www.sqlite.org/lang_altertable.html#alter_table_rename
+        cur.execute(_SCHEMA_SQL)  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Cursor.execute
+        cur.execute(_MIGRATE_TS_SQL)  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Cursor.execute
+        cur.execute("DROP TABLE telemetry_legacy")  # https://www.sqlite.org/lang_droptable.html
         conn.commit()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.commit
-    finally:
-        conn.close()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.close
+    except sqlite3.IntegrityError as e:  # unparseable legacy ts hit NOT NULL: https://docs.python.org/3/library/sqlite3.html#sqlite3.IntegrityError
+        conn.rollback()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.rollback
+        raise RuntimeError(
+            f"Cannot migrate telemetry.ts in {db_path} to INTEGER ({e}); "
+            "remove the file or point IIOT_DB at a new database"
+        ) from e  # https://docs.python.org/3/reference/simple_stmts.html#the-raise-statement
+    except sqlite3.Error:  # e.g. "database is locked"; transient, the data is fine
+        conn.rollback()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.rollback
+        raise  # https://docs.python.org/3/reference/simple_stmts.html#the-raise-statement
 
-def db_latest(n: int = 200, db_path: str = DB_PATH):
-    """Return latest N rows for dashboard."""  # https://docs.python.org/3/library/sqlite3.html
-    conn = sqlite3.connect(db_path)  # https://docs.python.org/3/library/sqlite3.html#sqlite3.connect
-    try:
+def db_init(db_path: str = DB_PATH) -> None:
+    """Initialize SQLite schema for telemetry, migrating legacy TEXT timestamps."""  # https://docs.python.org/3/library/sqlite3.html
+    with _writer_lock:  # https://docs.python.org/3/library/threading.html#using-locks-conditions-and-semaphores-in-the-with-statement
+        conn = db_writer(db_path)  # see above
         cur = conn.cursor()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.cursor
-        cur.execute("SELECT ts, sensor, temperature, humidity FROM telemetry ORDER BY id DESC LIMIT ?", (n,))  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Cursor.execute
-        return cur.fetchall()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Cursor.fetchall
-    finally:
-        conn.close()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.close
+        cur.execute("PRAGMA journal_mode=WAL")  # https://www.sqlite.org/wal.html
+        cur.execute(_SCHEMA_SQL)  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Cursor.execute
+        conn.commit()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.commit
+        # CREATE TABLE IF NOT EXISTS keeps an older schema as-is, so check the declared ts type
+        if _ts_column_type(cur) != "INTEGER":  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+            _migrate_ts_to_integer(conn, db_path)  # see above
+
+# Single statement text so sqlite3's per-connection statement cache parses it once
+_INSERT_SQL = "INSERT INTO telemetry(ts, sensor, temperature, humidity) VALUES (?, ?, ?, ?)"  # https://docs.python.org/3/library/sqlite3.html#sqlite3.connect
+
+def db_insert_many(rows, db_path: str = DB_PATH) -> None:
+    """Insert many telemetry rows in a single transaction."""  # https://docs.python.org/3/library/sqlite3.html
+    with _writer_lock:  # https://docs.python.org/3/library/threading.html#using-locks-conditions-and-semaphores-in-the-with-statement
+        conn = db_writer(db_path)  # see above
+        try:
+            cur = conn.cursor()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.cursor
+            cur.executemany(_INSERT_SQL, rows)  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Cursor.executemany
+            conn.commit()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.commit
+        except Exception:  # https://docs.python.org/3/tutorial/errors.html#handling-exceptions
+            conn.rollback()  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Connection.rollback
+            raise  # https://docs.python.org/3/reference/simple_stmts.html#the-raise-statement
+
+# Newest N rows, returned oldest first so results are already in chart order
+_LATEST_SQL = """
+    SELECT ts, sensor, temperature, humidity FROM (
+      SELECT id, ts, sensor, temperature, humidity FROM telemetry ORDER BY id DESC LIMIT ?
+    ) ORDER BY id ASC
+"""  # https://www.sqlite.org/lang_select.html#subqueries
+
+def db_latest_frame(n: int = 200, db_path: str = DB_PATH, pool=None) -> pd.DataFrame:
+    """Return latest N rows as a typed DataFrame, oldest first."""  # https://pandas.pydata.org/docs/reference/api/pandas.read_sql_query.html
+    with db_reader(db_path, pool) as conn:  # see above
+        return pd.read_sql_query(_LATEST_SQL, conn, params=(n,))  # https://pandas.pydata.org/docs/reference/api/pandas.read_sql_query.html
+
+# ---------- Batched Ingest ----------
+
+BATCH_SIZE = int(env("IIOT_BATCH_SIZE", "500"))  # https://docs.python.org/3/library/functions.html#int
+FLUSH_INTERVAL = float(env("IIOT_FLUSH_INTERVAL", "0.2"))  # https://docs.python.org/3/library/functions.html#float
+
+_ingest_buf = deque()  # append/popleft are thread-safe: https://docs.python.org/3/library/collections.html#collections.deque
+_flush_wake = threading.Event()  # https://docs.python.org/3/library/threading.html#event-objects
+_flush_stop = threading.Event()  # https://docs.python.org/3/library/threading.html#event-objects
+
+def enqueue_row(row) -> None:
+    """Buffer a telemetry row for the next batched insert."""  # https://docs.python.org/3/library/collections.html#collections.deque.append
+    _ingest_buf.append(row)  # https://docs.python.org/3/library/collections.html#collections.deque.append
+    if len(_ingest_buf) >= BATCH_SIZE:  # https://docs.python.org/3/library/functions.html#len
+        _flush_wake.set()  # https://docs.python.org/3/library/threading.html#threading.Event.set
+
+def _flush_batch(db_path: str = DB_PATH) -> int:
+    """Drain the buffer into SQLite with one commit; return rows written."""  # https://docs.python.org/3/library/sqlite3.html#sqlite3.Cursor.executemany
+    rows = drain(_ingest_buf)  # see iiot_system_hot.py
+    if rows:  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+        try:
+            db_insert_many(rows, db_path)  # see above
+        except Exception:  # https://docs.python.org/3/tutorial/errors.html#handling-exceptions
+            # Put the batch back at the front, in order, so the next flush retries it
+            _ingest_buf.extendleft(reversed(rows))  # https://docs.python.org/3/library/collections.html#collections.deque.extendleft
+            raise  # https://docs.python.org/3/reference/simple_stmts.html#the-raise-statement
+    return len(rows)  # https://docs.python.org/3/library/functions.html#len
+
+def start_flusher(db_path: str = DB_PATH) -> threading.Thread:
+    """Start a daemon thread that flushes the buffer on size or time threshold."""  # https://docs.python.org/3/library/threading.html#thread-objects
+    def loop():
+        while True:  # https://docs.python.org/3/reference/compound_stmts.html#the-while-statement
+            _flush_wake.wait(FLUSH_INTERVAL)  # https://docs.python.org/3/library/threading.html#threading.Event.wait
+            _flush_wake.clear()  # https://docs.python.org/3/library/threading.html#threading.Event.clear
+            if _flush_stop.is_set():  # the caller does the final drain after join()
+                break  # https://docs.python.org/3/reference/simple_stmts.html#the-break-statement
+            try:
+                _flush_batch(db_path)  # see above
+            except Exception as e:  # https://docs.python.org/3/tutorial/errors.html#handling-exceptions
+                log.exception(f"batch flush error, {len(_ingest_buf)} rows kept for retry: {e}")  # https://docs.python.org/3/library/logging.html#logging.Logger.exception
+
+    _flush_stop.clear()  # https://docs.python.org/3/library/threading.html#threading.Event.clear
+    t = threading.Thread(target=loop, name="sqlite-flusher", daemon=True)  # https://docs.python.org/3/library/threading.html#threading.Thread
+    t.start()  # https://docs.python.org/3/library/threading.html#threading.Thread.start
+    return t  # https://docs.python.org/3/library/functions.html#return
+
+def stop_flusher(t: threading.Thread) -> None:
+    """Stop the flusher thread and wait for any in-progress flush to finish."""  # https://docs.python.org/3/library/threading.html#threading.Thread.join
+    _flush_stop.set()  # https://docs.python.org/3/library/threading.html#threading.Event.set
+    _flush_wake.set()  # https://docs.python.org/3/library/threading.html#threading.Event.set
+    t.join()  # https://docs.python.org/3/library/threading.html#threading.Thread.join
 
 # ---------- MQTT Publisher (Simulated Sensors) ----------
 
@@ -101,37 +301,71 @@ MQTT_USER = env("IIOT_MQTT_USER", "")  # https://docs.python.org/3/library/os.ht
 MQTT_PASS = env("IIOT_MQTT_PASS", "")  # https://docs.python.org/3/library/os.html#os.getenv
 MQTT_TOPIC = env("IIOT_MQTT_TOPIC", "factory/line1/sensor/telemetry")  # https://docs.python.org/3/library/os.html#os.getenv
 PUBLISH_INTERVAL = float(env("IIOT_PUBLISH_INTERVAL", "2.0"))  # https://docs.python.org/3/library/functions.html#float
-
-def make_mqtt_client(client_id: str) -> mqtt.Client:
-    """Create and configure a Paho MQTT client."""  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#mqtt-client
-    client = mqtt.Client(client_id=client_id, clean_session=True)  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#client
+PUBLISH_BATCH = int(env("IIOT_PUBLISH_BATCH", "1"))  # simulated sensors published per tick: https://docs.python.org/3/library/functions.html#int
+MQTT_QOS = int(env("IIOT_MQTT_QOS", "0"))  # set to 1 for at-least-once delivery: https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#publish
+MQTT_MAX_INFLIGHT = int(env("IIOT_MQTT_MAX_INFLIGHT", "1000"))  # https://docs.python.org/3/library/functions.html#int
+# Opt-in SO_SNDBUF/SO_RCVBUF size in bytes; 0 leaves the kernel defaults. Paho only exposes the socket
+# after the handshake, so a fixed size disables Linux buffer autotuning (which can grow past it) and
+# cannot raise the already-negotiated receive window scale: https://man7.org/linux/man-pages/man7/tcp.7.html
+MQTT_SOCK_BUF = int(env("IIOT_MQTT_SOCK_BUF", "0"))  # https://docs.python.org/3/library/functions.html#int
+
+def _on_connect(client, userdata, flags, rc):  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#on-connect
+    """Log the connection, (re)subscribe, disable Nagle and optionally pin the socket buffer sizes."""  # https://docs.python.org/3/library/socket.html#socket.socket.setsockopt
+    log.info(f"MQTT connected rc={rc}")  # https://docs.python.org/3/library/logging.html#logging.Logger.info
+    if rc == 0 and userdata:  # clean_session drops subscriptions, so renew them on every connect
+        client.subscribe(userdata, qos=MQTT_QOS)  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#subscribe
+    sock = client.socket()  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#socket
+    if sock is not None:  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # https://docs.python.org/3/library/socket.html#socket.TCP_NODELAY
+        if MQTT_SOCK_BUF > 0:  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, MQTT_SOCK_BUF)  # https://man7.org/linux/man-pages/man7/socket.7.html
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, MQTT_SOCK_BUF)  # https://man7.org/linux/man-pages/man7/socket.7.html
+
+def make_mqtt_client(client_id: str, subscribe=None) -> mqtt.Client:
+    """Create and configure a Paho MQTT client; `subscribe` is a topic renewed on every connect."""  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#mqtt-client
+    client = mqtt.Client(client_id=client_id, clean_session=True, userdata=subscribe)  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#client
     if MQTT_USER:  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
         client.username_pw_set(MQTT_USER, MQTT_PASS)  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#username-pw-set
-    client.on_connect = lambda c, u, f, rc: log.info(f"MQTT connected rc={rc}")  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#on-connect
-    client.on_publish = lambda c, u, mid: log.debug(f"published mid={mid}")  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#on-publish
+    client.on_connect = _on_connect  # runs again after every reconnect: https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#on-connect
+    client.on_publish = lambda c, u, mid: msg_log.debug("published mid=%s", mid)  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#on-publish
+    client.max_inflight_messages_set(MQTT_MAX_INFLIGHT)  # default of 20 throttles QoS>0: https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#option-functions
+    client.max_queued_messages_set(0)  # 0 = unlimited outbound queue: https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#option-functions
+    client.reconnect_delay_set(min_delay=1, max_delay=30)  # exponential backoff: https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#reconnect-delay-set
     return client  # https://docs.python.org/3/library/functions.html#return
 
+RNG_BATCH = 4096  # samples generated per vectorized refill
+
+def sample_stream(rng: np.random.Generator, low: float, high: float, size: int = RNG_BATCH):
+    """Yield uniform samples rounded to 2 decimals, refilled in NumPy batches."""  # https://numpy.org/doc/stable/reference/random/generated/numpy.random.Generator.uniform.html
+    while True:  # https://docs.python.org/3/reference/compound_stmts.html#the-while-statement
+        # tolist() hands back plain Python floats, which orjson serializes natively
+        yield from rng.uniform(low, high, size=size).round(2).tolist()  # https://numpy.org/doc/stable/reference/generated/numpy.ndarray.tolist.html
+
 def run_publisher(sensor_name: str = "sensor-001") -> None:
-    """Run a loop that publishes simulated telemetry."""  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#publishing
-    db_init()  # https://docs.python.org/3/library/sqlite3.html
+    """Run a loop that publishes simulated telemetry for PUBLISH_BATCH sensors per tick."""  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#publishing
     client = make_mqtt_client(client_id=f"pub-{sensor_name}")  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#client
     client.connect(MQTT_HOST, MQTT_PORT, keepalive=60)  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#connect
     client.loop_start()  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#loop-start
     log.info("Publisher started")  # https://docs.python.org/3/library/logging.html#logging.Logger.info
+    rng = np.random.default_rng()  # PCG64: https://numpy.org/doc/stable/reference/random/generator.html
+    temps = sample_stream(rng, 20.0, 30.0)  # see above
+    hums = sample_stream(rng, 30.0, 70.0)  # see above
+    if PUBLISH_BATCH > 1:  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+        sensors = [f"{sensor_name}-{i:03d}" for i in range(PUBLISH_BATCH)]  # https://docs.python.org/3/tutorial/datastructures.html#list-comprehensions
+    else:
+        sensors = [sensor_name]  # https://docs.python.org/3/library/stdtypes.html#list
+    tick = rate_logger("Published")  # see above
+    next_deadline = time.monotonic()  # https://docs.python.org/3/library/time.html#time.monotonic
     try:
         while True:  # https://docs.python.org/3/reference/compound_stmts.html#the-while-statement
-            now = datetime.utcnow().isoformat()  # https://docs.python.org/3/library/datetime.html#datetime.datetime.isoformat
-            temp = round(random.uniform(20.0, 30.0), 2)  # https://docs.python.org/3/library/random.html#random.uniform
-            hum = round(random.uniform(30.0, 70.0), 2)  # https://docs.python.org/3/library/random.html#random.uniform
-            payload = {"ts": now, "sensor": sensor_name, "temperature": temp, "humidity": hum}  # https://docs.python.org/3/library/stdtypes.html#dict
-            j = json.dumps(payload)  # https://docs.python.org/3/library/json.html#json.dumps
-            result = client.publish(MQTT_TOPIC, j, qos=1, retain=False)  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#publish
-            status = result[0] if isinstance(result, tuple) else result.rc  # https://docs.python.org/3/library/functions.html#isinstance
-            if status == mqtt.MQTT_ERR_SUCCESS:  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#constants
-                log.info(f"Published {j} to {MQTT_TOPIC}")  # https://docs.python.org/3/library/logging.html#logging.Logger.info
-            else:
-                log.error(f"Publish failed rc={status}")  # https://docs.python.org/3/library/logging.html#logging.Logger.error
-            time.sleep(PUBLISH_INTERVAL)  # https://docs.python.org/3/library/time.html#time.sleep
+            next_deadline += PUBLISH_INTERVAL  # fixed cadence regardless of loop body time
+            now = time.time_ns()  # epoch nanoseconds (UTC): https://docs.python.org/3/library/time.html#time.time_ns
+            tick(publish_tick(client, MQTT_TOPIC, MQTT_QOS, now, sensors, temps, hums))  # see iiot_system_hot.py
+            sleep_for = next_deadline - time.monotonic()  # https://docs.python.org/3/library/time.html#time.monotonic
+            if sleep_for > 0:  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+                time.sleep(sleep_for)  # https://docs.python.org/3/library/time.html#time.sleep
+            elif sleep_for < -PUBLISH_INTERVAL:  # fell more than a period behind; resync instead of bursting
+                next_deadline = time.monotonic()  # https://docs.python.org/3/library/time.html#time.monotonic
     except KeyboardInterrupt:  # https://docs.python.org/3/tutorial/errors.html#handling-exceptions
         log.info("Publisher stopping")  # https://docs.python.org/3/library/logging.html#logging.Logger.info
     finally:
@@ -140,89 +374,155 @@ def run_publisher(sensor_name: str = "sensor-001") -> None:
 
 # ---------- MQTT Subscriber (ingest → SQLite) ----------
 
+class Telemetry(msgspec.Struct):
+    """Wire schema for a telemetry message."""  # https://jcristharif.com/msgspec/structs.html
+    ts: int  # epoch nanoseconds
+    sensor: str
+    temperature: float
+    humidity: float
+
+_decoder = msgspec.json.Decoder(Telemetry)  # https://jcristharif.com/msgspec/api.html#msgspec.json.Decoder
+
+def parse_telemetry(raw: bytes) -> tuple:
+    """Decode an MQTT payload into a (ts, sensor, temperature, humidity) row."""  # https://jcristharif.com/msgspec/usage.html
+    # Field types are enforced during decode; bad payloads raise msgspec.ValidationError
+    t = _decoder.decode(raw)  # https://jcristharif.com/msgspec/api.html#msgspec.json.Decoder.decode
+    return (t.ts, t.sensor, t.temperature, t.humidity)  # https://docs.python.org/3/library/stdtypes.html#tuple
+
 def run_subscriber() -> None:
     """Subscribe to MQTT and write telemetry into SQLite."""  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#subscriptions
-    db_init()  # https://docs.python.org/3/library/sqlite3.html
-    client = make_mqtt_client(client_id="sub-telemetry")  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#client
+    client = make_mqtt_client(client_id="sub-telemetry", subscribe=MQTT_TOPIC)  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#client
+    tick = rate_logger("Ingested")  # see above
 
-    def on_message(client, userdata, msg):  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#on-message
-        try:
-            payload = json.loads(msg.payload.decode("utf-8"))  # https://docs.python.org/3/library/json.html#json.loads
-            ts = payload["ts"]  # https://docs.python.org/3/library/stdtypes.html#dict
-            sensor = payload["sensor"]
-            temperature = float(payload["temperature"])  # https://docs.python.org/3/library/functions.html#float
-            humidity = float(payload["humidity"])  # https://docs.python.org/3/library/functions.html#float
-            db_insert(ts, sensor, temperature, humidity)  # https://docs.python.org/3/library/sqlite3.html
-            log.info(f"Ingested row from {sensor}")  # https://docs.python.org/3/library/logging.html#logging.Logger.info
-        except Exception as e:  # https://docs.python.org/3/tutorial/errors.html#handling-exceptions
-            log.exception(f"on_message error: {e}")  # https://docs.python.org/3/library/logging.html#logging.Logger.exception
-
-    client.on_message = on_message  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#on-message
-    client.connect(MQTT_HOST, MQTT_PORT, keepalive=60)  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#connect
-    client.subscribe(MQTT_TOPIC, qos=1)  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#subscribe
-    client.loop_forever()  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#loop-forever
+    client.on_message = lambda c, u, msg: handle_message(msg.payload, parse_telemetry, None, enqueue_row, tick)  # see iiot_system_hot.py
+    client.connect_async(MQTT_HOST, MQTT_PORT, keepalive=60)  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#connect-async
+    flusher = start_flusher()  # see above
+    try:
+        client.loop_forever(retry_first_connection=True)  # keeps retrying while the broker is down: https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#loop-forever
+    except KeyboardInterrupt:  # https://docs.python.org/3/tutorial/errors.html#handling-exceptions
+        log.info("Subscriber stopping")  # https://docs.python.org/3/library/logging.html#logging.Logger.info
+    finally:
+        stop_flusher(flusher)  # see above
+        _flush_batch()  # write out anything still buffered
 
 # ---------- OPC UA Server ----------
 
-OPCUA_ENDPOINT = env("IIOT_OPCUA_ENDPOINT", "opc.tcp://0.0.0.0:4840")  # https://freeopcua.github.io/python-opcua/
+OPCUA_ENDPOINT = env("IIOT_OPCUA_ENDPOINT", "opc.tcp://0.0.0.0:4840")  # https://opcua-asyncio.readthedocs.io/en/latest/
+
+def offer_latest(q: asyncio.Queue, row) -> None:
+    """Put row into a maxsize=1 queue, replacing any value not yet consumed."""  # https://docs.python.org/3/library/asyncio-queue.html
+    try:
+        q.put_nowait(row)  # https://docs.python.org/3/library/asyncio-queue.html#asyncio.Queue.put_nowait
+    except asyncio.QueueFull:  # https://docs.python.org/3/library/asyncio-queue.html#asyncio.QueueFull
+        q.get_nowait()  # drop the stale value: https://docs.python.org/3/library/asyncio-queue.html#asyncio.Queue.get_nowait
+        q.put_nowait(row)  # https://docs.python.org/3/library/asyncio-queue.html#asyncio.Queue.put_nowait
+
+async def build_opcua_server():
+    """Create an OPC UA server and return it with its telemetry variables."""  # https://opcua-asyncio.readthedocs.io/en/latest/
+    server = Server()  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.server.html#asyncua.server.server.Server
+    await server.init()  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.server.html#asyncua.server.server.Server.init
+    server.set_endpoint(OPCUA_ENDPOINT)  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.server.html#asyncua.server.server.Server.set_endpoint
+    uri = "http://example.org/iiot"  # https://opcua-asyncio.readthedocs.io/en/latest/
+    idx = await server.register_namespace(uri)  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.server.html#asyncua.server.server.Server.register_namespace
+    objects = server.get_objects_node()  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.server.html#asyncua.server.server.Server.get_objects_node
+    iiot = await objects.add_object(idx, "IIoT")  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.common.html#asyncua.common.node.Node.add_object
+    v_temp = await iiot.add_variable(idx, "Temperature", 0.0)  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.common.html#asyncua.common.node.Node.add_variable
+    v_hum = await iiot.add_variable(idx, "Humidity", 0.0)  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.common.html#asyncua.common.node.Node.add_variable
+    v_sensor = await iiot.add_variable(idx, "Sensor", "sensor-001")  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.common.html#asyncua.common.node.Node.add_variable
+    await v_temp.set_writable()  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.common.html#asyncua.common.node.Node.set_writable
+    await v_hum.set_writable()  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.common.html#asyncua.common.node.Node.set_writable
+    await v_sensor.set_writable()  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.common.html#asyncua.common.node.Node.set_writable
+    return server, v_temp, v_hum, v_sensor  # https://docs.python.org/3/library/stdtypes.html#tuple
+
+async def serve_opcua(ingest: bool = False) -> None:
+    """Expose the latest MQTT telemetry over OPC UA; with ingest=True also batch rows into SQLite."""  # https://opcua-asyncio.readthedocs.io/en/latest/
+    loop = asyncio.get_running_loop()  # https://docs.python.org/3/library/asyncio-eventloop.html#asyncio.get_running_loop
+    # Latest-only handoff from Paho's network thread into the event loop
+    latest = asyncio.Queue(maxsize=1)  # https://docs.python.org/3/library/asyncio-queue.html#asyncio.Queue
+    client = make_mqtt_client(client_id="combined-telemetry" if ingest else "opcua-telemetry", subscribe=MQTT_TOPIC)  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#client
+    tick = rate_logger("Ingested")  # see above
+
+    def offer(row) -> None:
+        loop.call_soon_threadsafe(offer_latest, latest, row)  # https://docs.python.org/3/library/asyncio-eventloop.html#asyncio.loop.call_soon_threadsafe
+
+    # OPC UA never waits on SQLite; with ingest the row also goes to the batched flusher
+    enqueue = enqueue_row if ingest else None
+    client.on_message = lambda c, u, msg: handle_message(msg.payload, parse_telemetry, offer, enqueue, tick)  # see iiot_system_hot.py
+    server, v_temp, v_hum, v_sensor = await build_opcua_server()  # see above
+    async with server:  # starts and stops the server: https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.server.html#asyncua.server.server.Server.start
+        log.info(f"OPC UA server started at {OPCUA_ENDPOINT}")  # https://docs.python.org/3/library/logging.html#logging.Logger.info
+        client.connect_async(MQTT_HOST, MQTT_PORT, keepalive=60)  # never blocks the event loop: https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#connect-async
+        client.loop_start()  # connects and reconnects in the background: https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#loop-start
+        flusher = start_flusher() if ingest else None  # see above
+        try:
+            while True:  # https://docs.python.org/3/reference/compound_stmts.html#the-while-statement
+                ts, sensor, temperature, humidity = await latest.get()  # https://docs.python.org/3/library/asyncio-queue.html#asyncio.Queue.get
+                await v_temp.write_value(float(temperature))  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.common.html#asyncua.common.node.Node.write_value
+                await v_hum.write_value(float(humidity))  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.common.html#asyncua.common.node.Node.write_value
+                await v_sensor.write_value(str(sensor))  # https://opcua-asyncio.readthedocs.io/en/latest/api/asyncua.common.html#asyncua.common.node.Node.write_value
+        finally:
+            client.loop_stop()  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#loop-stop
+            client.disconnect()  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#disconnect
+            if flusher is not None:  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+                stop_flusher(flusher)  # see above
+                _flush_batch()  # write out anything still buffered
 
 def run_opcua_server() -> None:
-    """Run a minimal OPC UA server that exposes telemetry variables."""  # https://freeopcua.github.io/python-opcua/
-    server = Server()  # https://freeopcua.github.io/python-opcua/
-    server.set_endpoint(OPCUA_ENDPOINT)  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.server.server.Server.set_endpoint
-    uri = "http://example.org/iiot"  # https://freeopcua.github.io/python-opcua/
-    idx = server.register_namespace(uri)  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.server.server.Server.register_namespace
-    objects = server.get_objects_node()  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.server.server.Server.get_objects_node
-    iiot = objects.add_object(idx, "IIoT")  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.common.node.Node.add_object
-    v_temp = iiot.add_variable(idx, "Temperature", 0.0)  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.common.node.Node.add_variable
-    v_hum = iiot.add_variable(idx, "Humidity", 0.0)  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.common.node.Node.add_variable
-    v_sensor = iiot.add_variable(idx, "Sensor", "sensor-001")  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.common.node.Node.add_variable
-    v_temp.set_writable()  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.common.node.Node.set_writable
-    v_hum.set_writable()  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.common.node.Node.set_writable
-    v_sensor.set_writable()  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.common.node.Node.set_writable
-
-    db_init()  # https://docs.python.org/3/library/sqlite3.html
-    server.start()  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.server.server.Server.start
-    log.info(f"OPC UA server started at {OPCUA_ENDPOINT}")  # https://docs.python.org/3/library/logging.html#logging.Logger.info
+    """Run a minimal OPC UA server that exposes the latest MQTT telemetry."""  # https://opcua-asyncio.readthedocs.io/en/latest/
     try:
-        while True:  # https://docs.python.org/3/reference/compound_stmts.html#the-while-statement
-            rows = db_latest(1)  # https://docs.python.org/3/library/sqlite3.html
-            if rows:
-                ts, sensor, temperature, humidity = rows[0]  # https://docs.python.org/3/library/stdtypes.html#typesseq
-                v_temp.set_value(float(temperature))  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.common.node.Node.set_value
-                v_hum.set_value(float(humidity))  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.common.node.Node.set_value
-                v_sensor.set_value(str(sensor))  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.common.node.Node.set_value
-            time.sleep(1.0)  # https://docs.python.org/3/library/time.html#time.sleep
+        asyncio.run(serve_opcua())  # https://docs.python.org/3/library/asyncio-runner.html#asyncio.run
     except KeyboardInterrupt:  # https://docs.python.org/3/tutorial/errors.html#handling-exceptions
         log.info("OPC UA server stopping")  # https://docs.python.org/3/library/logging.html#logging.Logger.info
-    finally:
-        server.stop()  # https://freeopcua.github.io/python-opcua/0.98.13/server.html#opcua.server.server.Server.stop
+
+# ---------- Combined Ingest + OPC UA ----------
+
+def run_combined() -> None:
+    """Ingest MQTT into SQLite and publish OPC UA values from the same callback."""  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#on-message
+    try:
+        asyncio.run(serve_opcua(ingest=True))  # https://docs.python.org/3/library/asyncio-runner.html#asyncio.run
+    except KeyboardInterrupt:  # https://docs.python.org/3/tutorial/errors.html#handling-exceptions
+        log.info("Combined mode stopping")  # https://docs.python.org/3/library/logging.html#logging.Logger.info
 
 # ---------- Streamlit Dashboard ----------
 
+DASHBOARD_TTL = float(env("IIOT_DASHBOARD_TTL", "1.0"))  # https://docs.python.org/3/library/functions.html#float
+
+@st.cache_resource  # https://docs.streamlit.io/develop/api-reference/caching-and-state/st.cache_resource
+def _db_init_once() -> None:
+    """Run db_init once per Streamlit server instead of on every rerun."""  # https://docs.streamlit.io/develop/concepts/architecture/caching
+    db_init()  # see above
+
+@st.cache_resource  # https://docs.streamlit.io/develop/api-reference/caching-and-state/st.cache_resource
+def _dashboard_pool() -> queue.LifoQueue:
+    """Reader pool that survives reruns; module globals are rebuilt on every rerun."""  # https://docs.streamlit.io/develop/concepts/architecture/caching
+    return db_reader_pool()  # see above
+
+@st.cache_data(ttl=DASHBOARD_TTL)  # https://docs.streamlit.io/develop/api-reference/caching-and-state/st.cache_data
+def _cached_latest(n: int):
+    """Memoize db_latest_frame across reruns for up to DASHBOARD_TTL seconds."""  # https://docs.streamlit.io/develop/concepts/architecture/caching
+    return db_latest_frame(n, pool=_dashboard_pool())  # see above
+
 def run_dashboard() -> None:
     """Run a Streamlit dashboard that reads from SQLite and charts values."""  # https://docs.streamlit.io/
     st.set_page_config(page_title="IIoT Dashboard", layout="wide")  # https://docs.streamlit.io/develop/api-reference/utilities/st.set_page_config
     st.title("IIoT Machine Monitoring System")  # https://docs.streamlit.io/develop/api-reference/text/st.title
     st.caption("Live telemetry from MQTT via SQLite")  # https://docs.streamlit.io/develop/api-reference/text/st.caption
 
-    db_init()  # https://docs.python.org/3/library/sqlite3.html
     n = st.sidebar.slider("Rows", min_value=50, max_value=1000, value=200, step=50)  # https://docs.streamlit.io/develop/api-reference/widgets/st.slider
-    data = db_latest(n)  # https://docs.python.org/3/library/sqlite3.html
+    df = _cached_latest(n)  # already oldest-first, so no reversal is needed
 
-    # Transform rows into lists for Streamlit charts
-    ts = [r[0] for r in data][::-1]  # https://docs.python.org/3/tutorial/datastructures.html#list-comprehensions
-    temps = [r[2] for r in data][::-1]  # https://docs.python.org/3/tutorial/datastructures.html#list-comprehensions
-    hums = [r[3] for r in data][::-1]  # https://docs.python.org/3/tutorial/datastructures.html#list-comprehensions
+    # Columnar frame straight from SQLite; index by wall-clock time for the charts
+    chart = df.set_index(pd.to_datetime(df["ts"], unit="ns"))  # https://pandas.pydata.org/docs/reference/api/pandas.to_datetime.html
+    chart = chart.rename(columns={"temperature": "Temperature", "humidity": "Humidity"})  # https://pandas.pydata.org/docs/reference/api/pandas.DataFrame.rename.html
 
     st.subheader("Temperature (°C)")  # https://docs.streamlit.io/develop/api-reference/text/st.subheader
-    st.line_chart({"Temperature": temps})  # https://docs.streamlit.io/develop/api-reference/charts/st.line_chart
+    st.line_chart(chart[["Temperature"]])  # https://docs.streamlit.io/develop/api-reference/charts/st.line_chart
 
     st.subheader("Humidity (%)")  # https://docs.streamlit.io/develop/api-reference/text/st.subheader
-    st.line_chart({"Humidity": hums})  # https://docs.streamlit.io/develop/api-reference/charts/st.line_chart
+    st.line_chart(chart[["Humidity"]])  # https://docs.streamlit.io/develop/api-reference/charts/st.line_chart
 
     with st.expander("Raw rows"):  # https://docs.streamlit.io/develop/api-reference/layout/st.expander
-        st.write(data)  # https://docs.streamlit.io/develop/api-reference/write-magic/st.write
+        st.dataframe(df)  # https://docs.streamlit.io/develop/api-reference/data/st.dataframe
 
     st.sidebar.markdown("**Hint:** Keep publisher & subscriber running for live data.")  # https://docs.streamlit.io/develop/api-reference/text/st.markdown
 
@@ -231,7 +531,7 @@ def run_dashboard() -> None:
 def parse_args(argv=None):
     """Parse command line arguments."""  # https://docs.python.org/3/library/argparse.html
     p = argparse.ArgumentParser(description="IIoT Machine Monitoring System")  # https://docs.python.org/3/library/argparse.html#argparse.ArgumentParser
-    p.add_argument("--mode", choices=["publisher", "subscriber", "opcua", "dashboard"], required=True,
+    p.add_argument("--mode", choices=["publisher", "subscriber", "opcua", "combined", "dashboard"], required=True,
                    help="Which component to run")  # https://docs.python.org/3/library/argparse.html#argparse.ArgumentParser.add_argument
     p.add_argument("--sensor", default="sensor-001", help="Sensor name for publisher mode")  # https://docs.python.org/3/library/argparse.html#argparse.ArgumentParser.add_argument
     return p.parse_args(argv)  # https://docs.python.org/3/library/argparse.html#argparse.ArgumentParser.parse_args
@@ -239,12 +539,19 @@ def parse_args(argv=None):
 def main(argv=None) -> int:
     """Main entrypoint that dispatches to the selected mode."""  # https://docs.python.org/3/library/functions.html#callable
     args = parse_args(argv)  # https://docs.python.org/3/library/argparse.html#argparse.ArgumentParser.parse_args
+    # Only modes that touch SQLite open it; publisher and opcua never do
+    if args.mode == "dashboard":  # Streamlit re-executes main on every rerun
+        _db_init_once()  # see above
+    elif args.mode in ("subscriber", "combined"):  # https://docs.python.org/3/reference/expressions.html#membership-test-operations
+        db_init()  # https://docs.python.org/3/library/sqlite3.html
     if args.mode == "publisher":  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
         run_publisher(sensor_name=args.sensor)  # see above
     elif args.mode == "subscriber":  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
         run_subscriber()  # see above
     elif args.mode == "opcua":  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
         run_opcua_server()  # see above
+    elif args.mode == "combined":  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+        run_combined()  # see above
     elif args.mode == "dashboard":  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
         run_dashboard()  # see above
     return 0  # https://docs.python.org/3/library/constants.html#True
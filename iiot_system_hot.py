@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-  # https://docs.python.org/3/library/functions.html#open
+
+# Per-message hot paths for iiot_system: the publish tick, inbound message handling and the
+# batch drain. Fully annotated so the module can be compiled with mypyc (`mypyc iiot_system_hot.py`);
+# the .py is used when no extension is built. Docs: https://mypyc.readthedocs.io/en/latest/
+
+import logging  # https://docs.python.org/3/library/logging.html
+from collections import deque  # https://docs.python.org/3/library/collections.html#collections.deque
+from typing import Any, Callable, Iterator, List, Optional, Tuple  # https://docs.python.org/3/library/typing.html
+
+import orjson  # https://github.com/ijl/orjson
+from paho.mqtt.client import MQTT_ERR_SUCCESS  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#constants
+
+Row = Tuple[int, str, float, float]  # (ts, sensor, temperature, humidity)
+
+# Same logger objects iiot_system configures; getLogger returns the existing instance
+log = logging.getLogger("iiot")  # https://docs.python.org/3/library/logging.html#logging.getLogger
+msg_log = logging.getLogger("iiot.msg")  # https://docs.python.org/3/library/logging.html#logging.getLogger
+
+def drain(buf: "deque[Row]") -> List[Row]:
+    """Pop every buffered row, oldest first."""  # https://docs.python.org/3/library/collections.html#collections.deque.popleft
+    rows: List[Row] = []  # https://docs.python.org/3/library/stdtypes.html#list
+    # popleft until IndexError: another consumer may empty the deque between a length check and a pop
+    try:
+        while True:  # https://docs.python.org/3/reference/compound_stmts.html#the-while-statement
+            rows.append(buf.popleft())  # https://docs.python.org/3/library/collections.html#collections.deque.popleft
+    except IndexError:  # https://docs.python.org/3/library/exceptions.html#IndexError
+        pass
+    return rows  # https://docs.python.org/3/library/functions.html#return
+
+def publish_tick(client: Any, topic: str, qos: int, ts: int, sensors: List[str],
+                 temps: Iterator[float], hums: Iterator[float]) -> int:
+    """Encode and queue one payload per sensor; return how many were accepted by Paho."""  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#publish
+    sent = 0
+    # Queue the whole tick on the one long-lived connection; Paho's network thread drains it
+    for name in sensors:  # https://docs.python.org/3/reference/compound_stmts.html#the-for-statement
+        payload = {"ts": ts, "sensor": name, "temperature": next(temps), "humidity": next(hums)}  # https://docs.python.org/3/library/functions.html#next
+        result = client.publish(topic, orjson.dumps(payload), qos=qos, retain=False)  # https://github.com/ijl/orjson#serialize
+        status = result[0] if isinstance(result, tuple) else result.rc  # https://docs.python.org/3/library/functions.html#isinstance
+        if status != MQTT_ERR_SUCCESS:  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+            log.error("Publish failed rc=%s", status)  # https://docs.python.org/3/library/logging.html#logging.Logger.error
+            continue  # https://docs.python.org/3/reference/simple_stmts.html#the-continue-statement
+        sent += 1
+        if msg_log.isEnabledFor(logging.DEBUG):  # https://docs.python.org/3/library/logging.html#logging.Logger.isEnabledFor
+            msg_log.debug("Published %s to %s", payload, topic)  # https://docs.python.org/3/library/logging.html#logging.Logger.debug
+    return sent  # https://docs.python.org/3/library/functions.html#return
+
+def handle_message(raw: bytes, decode: Callable[[bytes], Row],
+                   offer: Optional[Callable[[Row], None]],
+                   enqueue: Optional[Callable[[Row], None]],
+                   tick: Callable[[int], None]) -> None:
+    """Decode one MQTT payload, hand it to the OPC UA offer and/or the ingest buffer."""  # https://www.eclipse.org/paho/files/pypi/paho-mqtt/html/index.html#on-message
+    try:
+        row = decode(raw)  # https://jcristharif.com/msgspec/usage.html
+        if offer is not None:  # https://docs.python.org/3/tutorial/controlflow.html#if-statements
+            offer(row)
+        if enqueue is not None:  # persistence happens in the batched flusher, never inline
+            enqueue(row)
+            if msg_log.isEnabledFor(logging.DEBUG):  # https://docs.python.org/3/library/logging.html#logging.Logger.isEnabledFor
+                msg_log.debug("Ingested row from %s", row[1])  # https://docs.python.org/3/library/logging.html#logging.Logger.debug
+            tick(1)
+    except Exception as e:  # https://docs.python.org/3/tutorial/errors.html#handling-exceptions
+        log.exception(f"on_message error: {e}")  # https://docs.python.org/3/library/logging.html#logging.Logger.exception